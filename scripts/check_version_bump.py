@@ -9,50 +9,113 @@ from pathlib import Path
 from lxml import etree
 
 
+# evaluates to "" if there's no <version> element; converted with int() so that large versions stay exact
+VERSION_XPATH = etree.XPath("string(version)")
+
+
 class VersionNumberError(RuntimeError):
     pass
 
 
+class GitObjectError(RuntimeError):
+    pass
+
+
+class GitBlobReader:
+    """Reads file contents at a given commit through a single long-running `git cat-file --batch`
+    process, rather than starting a new `git show` process for every file. The process is only
+    started when the first file is read."""
+
+    def __init__(self):
+        self.process = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def read(self, ref: str, path: Path) -> bytes:
+        """Returns the contents of the file at `path` in the commit given by `ref`."""
+        if self.process is None:
+            self.process = subprocess.Popen(["git", "cat-file", "--batch"],
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+        self.process.stdin.write(f"{ref}:{path.as_posix()}\n".encode())
+        self.process.stdin.flush()
+
+        header = self.process.stdout.readline().decode()
+        if not header:
+            raise GitObjectError("git cat-file exited unexpectedly")
+        parts = header.split()
+        if len(parts) != 3 or not parts[2].isdigit():
+            # "<object> missing" or "<object> ambiguous": no contents follow
+            raise GitObjectError(f"{ref}:{path} not found ({header.strip()})")
+
+        size = int(parts[2])
+        contents = self.process.stdout.read(size)
+        self.process.stdout.read(1)  # trailing newline
+
+        # contents must be read even if they're not wanted, or later reads would be out of sync
+        if parts[1] != "blob":
+            raise GitObjectError(f"{ref}:{path} is a {parts[1]}, not a file")
+        return contents
+
+    def close(self):
+        if self.process is None:
+            return
+        self.process.stdin.close()
+        self.process.wait()
+        self.process.stdout.close()
+
+
 def validate_version_numbers(formats_dir: Path, base_ref: str) -> int:
     if not formats_dir.is_dir():
         print(f"{formats_dir} is not a directory")
         return 1
 
-    changed_files = get_diff_files("M", formats_dir, base_ref)
-    added_files = get_diff_files("A", formats_dir, base_ref)
+    diff_files = get_diff_files(formats_dir, base_ref)
+    changed_files = diff_files["M"]
+    added_files = diff_files["A"]
 
     if not changed_files and not added_files:
         print(f"🆗 No debate format files have changed since {base_ref}")
 
     nerrors = 0
-    for path in changed_files:
-        nerrors += check_version_number_increment(path, base_ref)
+    with GitBlobReader() as reader:
+        for path in changed_files:
+            nerrors += check_version_number_increment(path, base_ref, reader)
     for path in added_files:
         nerrors += check_version_number_is_one(path)
 
     return nerrors
 
 
-def get_diff_files(diff_filter: str, formats_dir: Path, base_ref: str):
+def get_diff_files(formats_dir: Path, base_ref: str) -> dict[str, list[Path]]:
+    """Returns the files in `formats_dir` that have been modified ("M") or added ("A") since
+    `base_ref`, using a single `git diff` call."""
     command = [
-        "git", "diff", "--name-only", f"--diff-filter={diff_filter}",
+        "git", "diff", "--name-status", "-z", "--diff-filter=AM",
         base_ref, "--", formats_dir,
     ]
     output = subprocess.check_output(command, text=True)
-    files = [Path(file) for file in output.split("\n") if file]
+    fields = output.split("\0")
+    files = {"M": [], "A": []}
+    for status, file in zip(fields[0::2], fields[1::2]):
+        files[status].append(Path(file))
     return files
 
 
-def check_version_number_increment(path: Path, base_ref: str) -> int:
+def check_version_number_increment(path: Path, base_ref: str, reader: GitBlobReader) -> int:
     """Validates that the version number in the file given by the path `path` has changed, by
     comparing it to the version number in the same file of the commit given by `base_ref`. The
     validation passes if no `base_ref` is given, or if the file has not changed."""
     filename = path.name
 
-    new_content = open(path, 'rb').read()
+    new_content = path.read_bytes()
     try:
-        original_content = subprocess.check_output(["git", "show", f"{base_ref}:{path}"], stderr=subprocess.STDOUT)
-    except subprocess.CalledProcessError as e:
+        original_content = reader.read(base_ref, path)
+    except GitObjectError as e:
         print(f"🛑 {filename} ERROR: Error getting original contents: {e}")
         return 1
 
@@ -73,7 +136,7 @@ def check_version_number_increment(path: Path, base_ref: str) -> int:
 
 
 def check_version_number_is_one(path: Path) -> int:
-    content = open(path, 'rb').read()
+    content = path.read_bytes()
     version = extract_version_number(content)
 
     if version != 1:
@@ -90,6 +153,12 @@ def extract_version_number(contents: str) -> int:
     except etree.XMLSyntaxError as e:
         raise VersionNumberError(f"Invalid XML: {e}")
 
+    try:
+        return int(VERSION_XPATH(root))
+    except ValueError:
+        pass
+
+    # slow path, to work out what went wrong
     element = root.find("version")
     if element is None:
         raise VersionNumberError("No <version> element found")
@@ -4,6 +4,9 @@
 import argparse
 import re
 from pathlib import Path
+from typing import Optional
+
+from lxml import etree
 
 
 CORRECT_DIR = "v1/formats"
@@ -12,18 +15,63 @@ WRONG_DIRS = [
     Path("v1"),
 ]
 
+# matched against raw bytes, so files don't need to be decoded (or even be text)
+DEBATE_FORMAT_PATTERN = re.compile(rb"<\s*debate\-?format")
+MIN_SIZE = len(b"<debateformat")
+ROOT_TAGS = {"debate-format", "debateformat"}
+
+
+class RootTagFoundError(Exception):
+    def __init__(self, tag):
+        self.tag = tag
+
+
+class RootTagCatcher:
+    """Parser target that stops parsing as soon as the root element starts."""
+
+    def start(self, tag, attrib):
+        raise RootTagFoundError(tag)
+
+    def close(self):
+        return None
+
+
+ROOT_TAG_PARSER = etree.XMLParser(target=RootTagCatcher())
+
+
+def get_root_tag(data: bytes) -> Optional[str]:
+    """Returns the tag of the root element in the (possibly truncated) XML document `data`, or None
+    if it doesn't start like a well-formed XML document."""
+    try:
+        ROOT_TAG_PARSER.feed(data)
+        ROOT_TAG_PARSER.close()
+    except RootTagFoundError as e:
+        return e.tag
+    except etree.XMLSyntaxError:
+        return None
+    return None
+
+
+def looks_like_debate_format(data: bytes) -> bool:
+    """Returns True if `data`, the start of a file, looks like a debate format. The regular
+    expression is the cheap check; files that match it and turn out to be XML are only flagged if
+    their root element is actually a debate format."""
+    if not DEBATE_FORMAT_PATTERN.search(data):
+        return False
+    root_tag = get_root_tag(data)
+    return root_tag is None or etree.QName(root_tag).localname in ROOT_TAGS
+
 
 def check_for_wrongly_located_files() -> int:
     """Checks that no file in any directory in the list `wrong_dirs` looks like a debate format file."""
 
-    pattern = re.compile(r"<\s*debate\-?format")
     wrong_files = []
 
     for wrong_dir in WRONG_DIRS:
         for child in wrong_dir.iterdir():
-            if child.is_file():
-                with open(child) as f:
-                    if pattern.search(f.read(500)):
+            if child.is_file() and child.stat().st_size >= MIN_SIZE:
+                with open(child, "rb") as f:
+                    if looks_like_debate_format(f.read(512)):
                         wrong_files.append(child)
 
     if wrong_files:
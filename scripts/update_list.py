@@ -8,7 +8,7 @@ from pathlib import Path
 
 from lxml import etree
 
-from validate_xml_schema import validate_xml_schema
+from validate_xml_schema import PARSER, validate_xml_schema
 
 parser = argparse.ArgumentParser(description=__doc__)
 parser.add_argument("formats_dir", nargs="?", default=Path("v1/formats"), type=Path)
@@ -24,6 +24,7 @@ if not args.formats_dir.is_dir():
 formats = []
 
 LANG_ATTR = "{http://www.w3.org/XML/1998/namespace}lang"
+VERSION_XPATH = etree.XPath("string(version)")
 
 for path in args.formats_dir.iterdir():
     if path.suffix != ".xml":
@@ -34,7 +35,7 @@ for path in args.formats_dir.iterdir():
     if errors:
         print("\n".join(errors))
 
-    root = etree.parse(open(path))
+    root = etree.parse(str(path), parser=PARSER)
 
     # respect order of declared languages if there are any...
     infos = {e.text: {} for e in root.findall("./languages/language")}
@@ -54,7 +55,7 @@ for path in args.formats_dir.iterdir():
     formats.append({
         "filename": path.name,
         "url": f"https://formats.debatekeeper.czlee.nz/v1/formats/{path.name}",
-        "version": int(root.findtext("version")),
+        "version": int(VERSION_XPATH(root)),
         "info": infos,
     })
 
@@ -2,177 +2,270 @@
 """Validates debate format XML files against the schema."""
 
 import argparse
+import functools
+import itertools
+import json
+import sys
+from collections.abc import Iterator
 from pathlib import Path
+from typing import Optional, TextIO
 
 from lxml import etree
 
 
-validator = etree.RelaxNG(etree.parse("schema-2.2.rng"))
+SCHEMA_PATH = Path("schema-2.2.rng")
 
 LANG_ATTR = "{http://www.w3.org/XML/1998/namespace}lang"
 
+# shared rather than allocated per file; element IDs aren't used, so don't collect them
+PARSER = etree.XMLParser(collect_ids=False)
+
+# compiled once here, rather than re-parsing the path on every find()/findall() call
+SPEECH_TYPES_XPATH = etree.XPath("speech-types/speech-type")
+SPEECHES_XPATH = etree.XPath("speeches/speech")
+PERIOD_TYPES_XPATH = etree.XPath("period-types/period-type")
+LANGUAGES_XPATH = etree.XPath("languages/language")
+
+
+class ParsedFormat:
+    """The elements of a debate format XML tree that more than one check needs, found once so that
+    each check doesn't walk the tree again."""
+
+    def __init__(self, root: etree.ElementTree):
+        self.root = root.getroot()
+        self.period_type_elements = get_period_type_elements(root)
+        self.speech_type_elements = SPEECH_TYPES_XPATH(root)
+        self.speech_elements = SPEECHES_XPATH(root)
+        # the schema requires at least one <language> in <languages>, so none found means no <languages>
+        self.languages = [e.text for e in LANGUAGES_XPATH(root)] or None
+
+
+@functools.lru_cache(maxsize=1)
+def get_validator() -> etree.RelaxNG:
+    """Returns the RelaxNG validator for the schema. The schema is only read and compiled the first
+    time this is called."""
+    return etree.RelaxNG(etree.fromstring(SCHEMA_PATH.read_bytes()))
+
 
 def validate_xml_schema(path: Path) -> list[str]:
     """Validates the file given by the path `path`, and returns a list of syntax, validation or
     cross-reference errors. (If validation is successful, the list will be empty.)"""
 
     try:
-        root = etree.parse(open(path))
+        root = etree.parse(str(path), parser=PARSER)
     except etree.XMLSyntaxError as e:
         error = f"XML syntax error in {path.name}: {e}"
         return [error]
 
+    # the validator is shared between files, but lxml resets its error log on each validate() call,
+    # so it only ever holds errors for this file
+    validator = get_validator()
     if not validator.validate(root):
         errors = [f"Validation error in {path.name}, line {err.line}, column {err.column}: "
                   f"{err.message}" for err in validator.error_log]
         return errors
 
-    errors = validate_cross_references(path.name, root)
-    errors += validate_multilingual_elements(path.name, root)
-    return errors
-
+    parsed = ParsedFormat(root)
+    errors = itertools.chain(
+        validate_cross_references(path.name, parsed),
+        validate_multilingual_elements(path.name, parsed),
+    )
+    return list(errors)
 
-def validate_cross_references(filename: str, root: etree.ElementTree) -> list[str]:
-    """Checks the cross-references for period types and speech types, given the root of a debate
-    format XML tree, and returns a list of errors. (If validation is successful, the list will be
-    empty.)"""
 
-    errors = []
+def validate_cross_references(filename: str, parsed: ParsedFormat) -> Iterator[str]:
+    """Checks the cross-references for period types and speech types, given a parsed debate format
+    XML tree, and yields any errors. (If validation is successful, nothing is yielded.)"""
 
-    period_types = ["normal", "pois-allowed", "warning", "overtime", None]
-    period_types.extend([pt.get("ref") for pt in get_period_type_elements(root)])
+    period_types = frozenset([
+        "normal", "pois-allowed", "warning", "overtime", None,
+        *(pt.get("ref") for pt in parsed.period_type_elements),
+    ])
 
-    for speech_type in root.find("speech-types").findall("speech-type"):
-        errors += validate_attribute_xref(filename, speech_type, "first-period", period_types)
-        for bell in speech_type.findall("bell"):
-            errors += validate_attribute_xref(filename, bell, "next-period", period_types)
+    for speech_type in parsed.speech_type_elements:
+        yield from validate_attribute_xref(filename, speech_type, "first-period", period_types)
+        for bell in speech_type.iterchildren(tag="bell"):
+            yield from validate_attribute_xref(filename, bell, "next-period", period_types)
 
-    speech_types = [st.get("ref") for st in root.find("speech-types").findall("speech-type")]
+    speech_types = frozenset(st.get("ref") for st in parsed.speech_type_elements)
 
-    for speech in root.find("speeches").findall("speech"):
-        errors += validate_attribute_xref(filename, speech, "type", speech_types)
+    for speech in parsed.speech_elements:
+        yield from validate_attribute_xref(filename, speech, "type", speech_types)
 
-    return errors
 
-
-def validate_attribute_xref(filename: str, element: etree.Element, attribute: str, allowed_values: list) -> list[str]:
+def validate_attribute_xref(filename: str, element: etree.Element, attribute: str,
+                            allowed_values: frozenset) -> Iterator[str]:
     value = element.get(attribute)
     if value not in allowed_values:
-        return [f"Cross-ref error in {filename}, line {element.sourceline}: "
-                f"unknown {attribute} {value!r}"]
-    return []
+        yield (f"Cross-ref error in {filename}, line {element.sourceline}: "
+               f"unknown {attribute} {value!r}")
 
 
-def validate_multilingual_elements(filename: str, root: etree.ElementTree) -> list[str]:
+def validate_multilingual_elements(filename: str, parsed: ParsedFormat) -> Iterator[str]:
 
-    languages_element = root.find("languages")
+    languages = parsed.languages
 
-    if languages_element is not None:
-        languages = [e.text for e in languages_element.findall("language")]
+    # maps each declared language to a bit, so each element's languages can be tracked in an int
+    if languages is None:
+        language_bits = None
     else:
-        languages = None
-
-    errors = []
-    errors += validate_multilingual_element(filename, languages, root.getroot(), "name")
-    errors += validate_multilingual_element(filename, languages, root.getroot(), "short-name",
-                                            optional=True)
-    errors += validate_multilingual_element(filename, languages, root.getroot(), "info")
-    for period_type in get_period_type_elements(root):
-        errors += validate_multilingual_element(filename, languages, period_type, "name")
-        errors += validate_multilingual_element(filename, languages, period_type, "display")
-    for speech_type in root.find("speech-types").findall("speech-type"):
-        errors += validate_multilingual_element(filename, languages, speech_type, "name", optional=True)
-    for speech in root.find("speeches").findall("speech"):
-        errors += validate_multilingual_element(filename, languages, speech, "name")
-    return errors
-
-
-def validate_multilingual_element(filename: str, languages: list, element: etree.Element,
-                                  subelement: str, optional=False) -> list[str]:
+        language_bits = {language: 1 << i for i, language in enumerate(dict.fromkeys(languages))}
+
+    check = functools.partial(validate_multilingual_element, filename, languages, language_bits)
+
+    yield from check(parsed.root, "name")
+    yield from check(parsed.root, "short-name", optional=True)
+    yield from check(parsed.root, "info")
+    for period_type in parsed.period_type_elements:
+        yield from check(period_type, "name")
+        yield from check(period_type, "display")
+    for speech_type in parsed.speech_type_elements:
+        yield from check(speech_type, "name", optional=True)
+    for speech in parsed.speech_elements:
+        yield from check(speech, "name")
+
+
+def validate_multilingual_element(filename: str, languages: list, language_bits: dict, element: etree.Element,
+                                  subelement: str, optional=False) -> Iterator[str]:
     """Checks that the element given either has exactly one of the subelement, or every subelement
-    has a unique language specifier."""
-    errors = []
-    children = element.findall(subelement)
+    has a unique language specifier. `language_bits` maps each declared language to a distinct bit;
+    both it and `languages` are None if no languages are declared."""
+    children = list(element.iterchildren(tag=subelement))
 
     if len(children) == 0 and optional:
-        return errors
+        return
 
-    def add_error(el, message):
-        errors.append(f"Multilingual error in {filename}, line {el.sourceline}: {message}")
+    def error(el, message):
+        return f"Multilingual error in {filename}, line {el.sourceline}: {message}"
 
     if languages is None:
         if len(children) > 1:
-            add_error(children[1],
+            yield error(children[1],
                 f"Multiple {subelement} elements found, but no languages declared in file")
         for child in children:
             if child.get(LANG_ATTR):
-                add_error(child,
+                yield error(child,
                     f"Attribute 'lang' found in {subelement}, but no languages declared in file")
 
     else:
-        found = dict.fromkeys(languages, False)
+        found = 0
         for child in children:
             language = child.get(LANG_ATTR)
+            bit = language_bits.get(language)
             if language is None:
-                add_error(child, f"Language not specified with multiple {subelement} elements")
-            elif language not in languages:
-                add_error(child, f"Language {language!r} not declared in <languages>")
-            elif found[language]:
-                add_error(child, f"Language {language!r} found multiple times in {subelement} elements")
-            found[language] = True
+                yield error(child, f"Language not specified with multiple {subelement} elements")
+            elif bit is None:
+                yield error(child, f"Language {language!r} not declared in <languages>")
+            elif found & bit:
+                yield error(child, f"Language {language!r} found multiple times in {subelement} elements")
+            else:
+                found |= bit
 
-        for language in languages:
-            if not found[language]:
-                add_error(element, f"No translation for {subelement} found for language {language!r}")
-    return errors
+        if found != (1 << len(language_bits)) - 1:
+            for language in languages:
+                if not found & language_bits[language]:
+                    yield error(element, f"No translation for {subelement} found for language {language!r}")
 
 
 def get_period_type_elements(root: etree.ElementTree) -> list[etree.ElementTree]:
     """Returns an iterable over custom period types, or an empty iterable if there aren't any."""
-    period_types = root.find("period-types")
-    if period_types is None:
-        return []
-    return period_types.findall("period-type")
+    return PERIOD_TYPES_XPATH(root)
 
 
-def validate_xml_schema_for_all_files(formats_dir: Path) -> int:
-    """Validates all files in the directory `formats_dir`."""
+def validate_xml_schema_for_all_files(formats_dir: Path, jobs: Optional[int] = 1) -> int:
+    """Validates all files in the directory `formats_dir`. By default, this is done in this process;
+    if `jobs` is more than 1, files are validated in that many processes in parallel (or one per
+    CPU, if `jobs` is None)."""
     if not formats_dir.is_dir():
         print(f"{formats_dir} is not a directory")
         return 1
 
     failures = []
     successes = []
+    paths = []
+    lines = []  # output is written all at once at the end, rather than a write per file
 
     for child in formats_dir.iterdir():
         if child.suffix != ".xml":
-            print(f"skipping {child}")
+            lines.append(f"skipping {child}")
             continue
+        paths.append(child)
 
-        errors = validate_xml_schema(child)
+    # with only a few dozen files, starting worker processes costs more than it saves, so parallel
+    # validation is opt-in; each worker then compiles the schema once
+    if jobs == 1:
+        results = map(validate_xml_schema, paths)
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=jobs, initializer=get_validator) as executor:
+            results = executor.map(validate_xml_schema, paths, chunksize=4)
+
+    for child, errors in zip(paths, results):
         if errors:
-            print("\n".join(errors))
+            lines.extend(errors)
             failures.append(child)
         else:
             successes.append(child)
 
     if failures:
-        print(f"\n{len(successes)} files passed validation.")
-        print(f"\n❌ Validation failures in the following {len(failures)} files:")
-        for failure in failures:
-            print(f" - {failure}")
-        return 1
+        lines.append(f"\n{len(successes)} files passed validation.")
+        lines.append(f"\n❌ Validation failures in the following {len(failures)} files:")
+        lines.extend(f" - {failure}" for failure in failures)
+        return_code = 1
 
     else:
-        print(f"✅ All {len(successes)} files passed validation.")
-        return 0
+        lines.append(f"✅ All {len(successes)} files passed validation.")
+        return_code = 0
+
+    sys.stdout.write("\n".join(lines) + "\n")
+    return return_code
+
+
+def serve(infile: TextIO = sys.stdin, outfile: TextIO = sys.stdout) -> int:
+    """Validates files whose paths are read from `infile`, one per line, and writes a JSON list of
+    errors for each to `outfile`, one per line, until `infile` is closed. This avoids paying the
+    start-up and schema compilation cost for every file, for editors and watchers that validate
+    files repeatedly."""
+    get_validator()
+
+    for line in infile:
+        if not line.strip():
+            continue
+        path = Path(line.rstrip("\n"))
+
+        try:
+            errors = validate_xml_schema(path)
+        except OSError as e:
+            errors = [f"Couldn't read {path}: {e}"]
+
+        outfile.write(json.dumps(errors) + "\n")
+        outfile.flush()
+
+    return 0
+
+
+def positive_int(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, not {number}")
+    return number
 
 
 if __name__ == "__main__":
 
     parser = argparse.ArgumentParser(description=__doc__)
-    parser.add_argument("formats_dir", nargs="?", default=Path("v1/formats"), type=Path)
+    parser.add_argument("formats_dir", nargs="?", type=Path,
+        help="Directory of debate format files (default: v1/formats)")
+    parser.add_argument("-j", "--jobs", type=positive_int,
+        help="Number of processes to validate files in (default: 1, i.e. no worker processes)")
+    parser.add_argument("--server", action="store_true",
+        help="Keep running, reading file paths from stdin and writing JSON lists of errors to stdout")
     args = parser.parse_args()
 
-    return_code = validate_xml_schema_for_all_files(args.formats_dir)
+    if args.server:
+        if args.formats_dir is not None or args.jobs is not None:
+            parser.error("--server reads file paths from stdin, so can't be used with formats_dir or --jobs")
+        return_code = serve()
+    else:
+        return_code = validate_xml_schema_for_all_files(args.formats_dir or Path("v1/formats"), args.jobs or 1)
     exit(return_code)